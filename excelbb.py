@@ -1,20 +1,26 @@
 # app.py
 
+import functools
+import hashlib
 import io
 import os
 import re
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import pandas as pd
+from pandas.api.types import infer_dtype
 import requests
 import streamlit as st
-from PIL import Image as PILImage
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import landscape
 from reportlab.lib.units import inch
 from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
 from reportlab.platypus import (
     Image,
+    LongTable,
     Paragraph,
     SimpleDocTemplate,
     Spacer,
@@ -30,67 +36,173 @@ FONTS = {
     "Barlow":  "https://raw.githubusercontent.com/scooter7/ExcelBudgetBox/main/fonts/Barlow-Regular.ttf",
     "DMSerif": "https://raw.githubusercontent.com/scooter7/ExcelBudgetBox/main/fonts/DMSerifDisplay-Regular.ttf",
 }
-for name, url in FONTS.items():
-    r = requests.get(url)
-    path = tempfile.NamedTemporaryFile(delete=False, suffix=".ttf").name
-    with open(path, "wb") as f:
-        f.write(r.content)
-    pdfmetrics.registerFont(TTFont(name, path))
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "excelbb")
+# keep-alive sessions for the font and logo fetches, one per thread since a
+# requests.Session isn't guaranteed to be thread-safe
+_HTTP = threading.local()
+
+
+def http_session():
+    if not hasattr(_HTTP, "session"):
+        _HTTP.session = requests.Session()
+        _HTTP.session.headers.update({"User-Agent": "excelbb/1.0"})
+    return _HTTP.session
+
+
+def fetch_cached(url, suffix):
+    # download once per machine; later processes reuse the file on disk
+    path = os.path.join(CACHE_DIR, hashlib.sha1(url.encode()).hexdigest() + suffix)
+    if not os.path.exists(path):
+        r = http_session().get(url, timeout=10)
+        r.raise_for_status()
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # write to a unique file beside the target and rename, so a crash or
+        # another session's thread never leaves a truncated font/logo at the
+        # cached path; a failed write cleans up after itself
+        fd, tmp = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(r.content)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    return path
+
+
+@st.cache_resource(show_spinner=False)
+def register_fonts():
+    # on a cold cache fetch both fonts and the logo concurrently
+    urls = [*FONTS.values(), LOGO_URL]
+    suffixes = [".ttf"] * len(FONTS) + [".png"]
+    with ThreadPoolExecutor(max_workers=len(urls)) as ex:
+        paths = list(ex.map(fetch_cached, urls, suffixes))
+    # registration is process-wide and outlives a cleared Streamlit cache
+    registered = set(pdfmetrics.getRegisteredFontNames())
+    for name, path in zip(FONTS, paths):
+        if name not in registered:
+            pdfmetrics.registerFont(TTFont(name, path))
+
+
+@st.cache_data(show_spinner=False)
+def fetch_logo(url):
+    # raw PNG bytes, held in memory so each PDF build skips the disk read
+    with open(fetch_cached(url, ".png"), "rb") as f:
+        return f.read()
+
+
+try:
+    import pyarrow  # noqa: F401
+    STR_DTYPE = "string[pyarrow]"
+except ImportError:
+    STR_DTYPE = None
 
 st.set_page_config(page_title="Proposal → PDF", layout="wide")
 
+# what the pyarrow CSV engine infers from text the C engine keeps as-is
+_TEMPORAL = ("datetime64", "datetime", "date", "time", "timedelta64", "timedelta")
+
 
 def load_and_prepare_dataframe(uploaded_file):
     fn = uploaded_file.name.lower()
     if fn.endswith((".xls", ".xlsx")):
-        df = pd.read_excel(uploaded_file, header=1)
+        try:
+            df = pd.read_excel(uploaded_file, header=1, engine="calamine")
+        except ImportError:
+            df = pd.read_excel(uploaded_file, header=1)
     else:
-        df = pd.read_csv(uploaded_file, header=1)
+        # the pyarrow engine is much faster but rejects ragged rows, leaves
+        # blank/duplicate headers as "" and "X", "X" where the C engine gives
+        # "Unnamed: N" and "X.1", and turns date/time text into values that
+        # render differently; reread those files with the C engine
+        try:
+            df = pd.read_csv(uploaded_file, header=1, engine="pyarrow")
+        except (ImportError, pd.errors.ParserError):
+            df = None
+        if (
+            df is None
+            or df.columns.has_duplicates
+            or (df.columns == "").any()
+            or any(
+                infer_dtype(df.iloc[:, i], skipna=True) in _TEMPORAL
+                for i in range(df.shape[1])
+            )
+        ):
+            uploaded_file.seek(0)
+            df = pd.read_csv(uploaded_file, header=1)
     first = df.columns[0]
     if first != "Service":
         df = df.rename(columns={first: "Service"})
+    # pure-text columns go to Arrow strings so the .str calls downstream run
+    # on pyarrow's compute kernels; mixed columns keep their values as-is
+    if STR_DTYPE is not None:
+        # by position: a header can repeat in the sheet
+        for i in range(df.shape[1]):
+            s = df.iloc[:, i]
+            if s.dtype == object and infer_dtype(s, skipna=True) == "string":
+                df.isetitem(i, s.astype(STR_DTYPE))
     return df
 
 
+# one pass for: leading "XX:" code, anything from the first "/" on, and
+# "(...)" asides (which can't contain "/" once the tail is cut).
+# Plain strings rather than compiled patterns: Arrow-backed columns only
+# stay on pyarrow's regex kernels for str patterns (and case=False).
+_CLEAN = r'^..:|\([^/\n]*?\)|/[\s\S]*'
+
+
 def transform_service_column(df):
-    def clean(s):
-        s = str(s)
-        s = re.sub(r'^..:', '', s)
-        s = s.split('/', 1)[0]
-        s = re.sub(r'\(.*?\)', '', s)
-        return s.strip()
-    df["Service"] = df["Service"].fillna("").apply(clean)
+    s = df["Service"].fillna("")
+    # Arrow strings are used as-is; anything else (object, numbers, dates)
+    # is cast so the .str calls below always have text to work on
+    if not isinstance(s.dtype, pd.StringDtype):
+        s = s.astype(str)
+    df["Service"] = s.str.replace(_CLEAN, "", regex=True).str.strip()
     return df
 
 
+# NBSP is spelled out: Arrow-backed columns match with RE2, whose \s is
+# ASCII-only, and Excel cells often carry "Est\xa0Conversions"
+_EST_CONV = r'est(?:\.|[\s\xa0])?[\s\xa0]*conversions?'
+_EST_IMPR = r'est(?:\.|[\s\xa0])?[\s\xa0]*impressions?'
+_EST_ROW = r'est(?:\.|[\s\xa0])?[\s\xa0]*(?:conversions?|impressions?)'
+
+
 def replace_est(df):
     # unify variants of "Estimated Conversions" and "Estimated Impressions"
     new_cols = []
     for c in df.columns:
         lc = c.lower()
-        if re.search(r'est(?:\.|\s)?\s*conversions?', lc) or 'estimated conversions' in lc:
+        if re.search(_EST_CONV, lc) or 'estimated conversions' in lc:
             new_cols.append("Estimated Conversions")
-        elif re.search(r'est(?:\.|\s)?\s*impressions?', lc) or 'estimated impressions' in lc:
+        elif re.search(_EST_IMPR, lc) or 'estimated impressions' in lc:
             new_cols.append("Estimated Impressions")
         else:
             new_cols.append(c.strip())
     df.columns = new_cols
-    return df.applymap(lambda v: v.replace("Est.", "Estimated") if isinstance(v, str) else v)
+    # only columns that actually hold text can contain "Est."; non-string
+    # cells come back as NaN from .str and keep their original value
+    # (by position, so a repeated header can't turn df[c] into a frame)
+    for i in range(df.shape[1]):
+        s = df.iloc[:, i]
+        if not (s.dtype == object or isinstance(s.dtype, pd.StringDtype)):
+            continue
+        if infer_dtype(s, skipna=True) not in ("string", "mixed", "mixed-integer"):
+            continue
+        replaced = s.str.replace("Est.", "Estimated", regex=False)
+        df.isetitem(i, replaced.where(replaced.notna(), s))
+    return df
 
 
 def split_tables(df):
-    segments, start = [], 0
-    for i, svc in enumerate(df["Service"]):
-        if str(svc).strip().lower() == "total":
-            seg = df.iloc[start : i + 1].reset_index(drop=True)
-            name = next(
-                (x for x in seg["Service"] if x and x.strip().lower() != "service"),
-                f"Table{len(segments)+1}"
-            )
-            segments.append({"name": name, "df": seg})
-            start = i + 1
-    if start < len(df):
-        seg = df.iloc[start:].reset_index(drop=True)
+    # each segment runs up to and including a "Total" row
+    svc = df["Service"].astype(str).str.strip().str.lower()
+    bounds = [0, *(np.flatnonzero((svc == "total").to_numpy()) + 1).tolist()]
+    if bounds[-1] < len(df):
+        bounds.append(len(df))
+    segments = []
+    for start, stop in zip(bounds, bounds[1:]):
+        seg = df.iloc[start:stop].reset_index(drop=True)
         name = next(
             (x for x in seg["Service"] if x and x.strip().lower() != "service"),
             f"Table{len(segments)+1}"
@@ -99,20 +211,36 @@ def split_tables(df):
     return segments
 
 
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_segments(data, name):
+    # keyed on the raw upload bytes so widget reruns skip the parse and
+    # the cleanup passes entirely
+    buf = io.BytesIO(data)
+    buf.name = name
+    df = load_and_prepare_dataframe(buf)
+    df = transform_service_column(df)
+    df = replace_est(df)
+    return df, split_tables(df)
+
+
 def calculate_and_insert_totals(seg_df):
-    df = seg_df.copy()
+    svc = seg_df["Service"].fillna("")
     # drop any "estimated conversions"/"est conversions" or impressions rows
-    drop_mask = df["Service"].fillna("").str.strip().str.lower().str.contains(
-        r'est(?:\.|\s)?\s*(conversions?|impressions?)'
-    )
-    df = df.loc[~drop_mask].reset_index(drop=True)
-
+    drop_mask = svc.str.contains(_EST_ROW, case=False, na=False)
     # find original total row if present
-    mask_total = df["Service"].str.strip().str.lower() == "total"
-    orig = df.loc[mask_total].iloc[0] if mask_total.any() else None
-
-    # remove any existing total rows
-    df = df.loc[~mask_total].reset_index(drop=True)
+    mask_total = svc.str.strip().str.lower() == "total"
+    # already well formed (e.g. a second pass from make_pdf): nothing to drop
+    # and a single, fully filled "Total" row at the end, so skip the rebuild
+    if (
+        len(svc) and svc.iat[-1] == "Total"
+        and mask_total.sum() == 1 and not drop_mask.any()
+        and seg_df.iloc[-1].notna().all()
+    ):
+        return seg_df
+    orig = seg_df.loc[mask_total].iloc[0] if mask_total.any() else None
+
+    # one filtered copy without the dropped and existing total rows
+    df = seg_df.loc[~(drop_mask | mask_total)].reset_index(drop=True)
 
     # build new total row
     total = {c: "" for c in df.columns}
@@ -123,32 +251,59 @@ def calculate_and_insert_totals(seg_df):
             if pd.notna(v):
                 total[c] = v
 
-    return pd.concat([df, pd.DataFrame([total])], ignore_index=True)
+    # append in place; df is already a fresh frame
+    df.loc[len(df)] = [total[c] for c in df.columns]
+    return df
+
+
+@functools.lru_cache(maxsize=32)
+def classify_columns(columns):
+    # segments usually share a schema, so this runs once per column layout
+    # rather than once per segment
+    date_cols = [c for c in columns if "date" in c.lower()]
+    money_cols = [c for c in ("Monthly Amount","Item Total") if c in columns]
+    wrap_cols = [i for i,c in enumerate(columns) if c in ("Service","Description","Notes")]
+    return date_cols, money_cols, wrap_cols
+
+
+# built once per process instead of on every make_pdf call
+STYLES = getSampleStyleSheet()
+HDR_STYLE = ParagraphStyle("hdr", parent=STYLES["BodyText"],
+                           fontName="DMSerif", fontSize=8, leading=9, alignment=1)
+BOD_STYLE = ParagraphStyle("bod", parent=STYLES["BodyText"],
+                           fontName="Barlow", fontSize=7, leading=8, alignment=0)
+
+# static part of every segment table's style; make_pdf only appends the
+# commands that depend on the segment's columns and row count
+SEGMENT_STYLE = [
+    ("GRID",(0,0),(-1,-1),0.4,colors.black),
+    ("BACKGROUND",(0,0),(-1,0),colors.lightgrey),
+    ("FONTNAME",(0,0),(-1,0),"DMSerif"),
+    ("FONTNAME",(0,1),(-1,-1),"Barlow"),
+    ("FONTSIZE",(0,0),(-1,-1),7),
+    ("ALIGN",(0,0),(-1,-1),"CENTER"),
+    ("VALIGN",(0,0),(-1,-1),"MIDDLE"),
+]
 
 
 def make_pdf(segments, title, table_titles):
-    buf = io.BytesIO()
+    # fonts (and the logo) are only fetched once a PDF is actually requested
+    register_fonts()
+    # small PDFs stay in memory, large ones spill to disk while building
+    buf = tempfile.SpooledTemporaryFile(max_size=4 * 1024 * 1024)
     doc = SimpleDocTemplate(
         buf,
         pagesize=(17*inch, 11*inch),
         leftMargin=0.5*inch, rightMargin=0.5*inch,
         topMargin=0.5*inch, bottomMargin=0.5*inch,
+        pageCompression=1, invariant=1,
     )
-    styles = getSampleStyleSheet()
-    hdr = ParagraphStyle("hdr", parent=styles["BodyText"],
-                         fontName="DMSerif", fontSize=8, leading=9, alignment=1)
-    bod = ParagraphStyle("bod", parent=styles["BodyText"],
-                         fontName="Barlow", fontSize=7, leading=8, alignment=0)
 
     elems = []
     # Logo & Title
-    resp = requests.get(LOGO_URL)
-    logo = PILImage.open(io.BytesIO(resp.content))
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-    logo.save(tmp.name)
-    elems.append(Image(tmp.name, width=4.5*inch, height=1.5*inch))
+    elems.append(Image(io.BytesIO(fetch_logo(LOGO_URL)), width=4.5*inch, height=1.5*inch))
     elems.append(Spacer(1,12))
-    elems.append(Paragraph(f"<b>{title}</b>", styles["Title"]))
+    elems.append(Paragraph(f"<b>{title}</b>", STYLES["Title"]))
     elems.append(Spacer(1,12))
 
     def fmt_money(val):
@@ -161,6 +316,17 @@ def make_pdf(segments, title, table_titles):
         except:
             return ""
 
+    def fmt_money_col(col):
+        # vectorized fmt_money: strip to digits, round, then format
+        num = pd.to_numeric(
+            col.astype(str).str.replace(r"[^\d.]", "", regex=True), errors="coerce"
+        )
+        # a plain list comprehension over int64s beats a regex-based
+        # thousands grouping and skips Series.map's index alignment
+        vals = np.rint(num.fillna(0).to_numpy()).astype(np.int64).tolist()
+        txt = pd.Series([f"${v:,}" for v in vals], index=col.index)
+        return txt.where(num.notna(), "")
+
     grand_total_item = 0.0
     widths = [0.12,0.30,0.06,0.08,0.08,0.12,0.12,0.06,0.06]
     colw = [doc.width*w for w in widths]
@@ -169,23 +335,21 @@ def make_pdf(segments, title, table_titles):
         # insert custom title above table if provided
         custom = table_titles.get(seg["name"], "").strip()
         if custom:
-            elems.append(Paragraph(f"<b>{custom}</b>", styles["Heading3"]))
+            elems.append(Paragraph(f"<b>{custom}</b>", STYLES["Heading3"]))
             elems.append(Spacer(1,6))
 
-        df = seg["df"].fillna("").copy()
-        # drop blank Service rows
-        df = df[df["Service"].str.strip().astype(bool)].reset_index(drop=True)
-        # drop repeated header row if present
-        mask_hdr = df["Service"].str.strip().str.lower() == "service"
+        df = seg["df"].fillna("")
+        # drop blank Service rows and any repeated header row in one pass
+        svc = df["Service"].str.strip()
+        mask_hdr = svc.str.lower() == "service"
         if "Description" in df.columns:
             mask_hdr &= df["Description"].astype(str).str.strip().str.lower() == "description"
-        df = df.loc[~mask_hdr].reset_index(drop=True)
+        df = df.loc[svc.astype(bool) & ~mask_hdr].reset_index(drop=True)
 
         df = calculate_and_insert_totals(df).fillna("")
 
-        # accumulate for grand total
-        tot_row = df.loc[df["Service"]=="Total"].iloc[0]
-        raw = tot_row.get("Item Total","")
+        # accumulate for grand total; the Total row is always appended last
+        raw = df["Item Total"].iat[-1] if "Item Total" in df.columns else ""
         num = re.sub(r"[^\d.]", "", str(raw))
         try:
             grand_total_item += float(num) if num else 0.0
@@ -193,37 +357,45 @@ def make_pdf(segments, title, table_titles):
             pass
 
         # format
-        for col in df.columns:
-            if "date" in col.lower():
-                df[col] = pd.to_datetime(df[col], errors="coerce").dt.strftime("%m/%d/%Y").fillna("")
-        for col in ("Monthly Amount","Item Total"):
-            if col in df.columns:
-                df[col] = df[col].apply(fmt_money)
+        date_cols, money_cols, wrap_cols = classify_columns(tuple(df.columns))
+        if date_cols:
+            df[date_cols] = df[date_cols].apply(
+                lambda s: pd.to_datetime(s, errors="coerce").dt.strftime("%m/%d/%Y")
+            ).fillna("")
+        if money_cols:
+            # format every money cell in a single pass, then fold back into columns
+            flat = fmt_money_col(pd.Series(df[money_cols].to_numpy().ravel()))
+            df[money_cols] = flat.to_numpy().reshape(len(df), len(money_cols))
 
         # build table
-        header = [Paragraph(c, hdr) for c in df.columns]
-        data = [header]
-        for row in df.itertuples(index=False):
-            cells=[]
-            for c,v in zip(df.columns, row):
-                txt = "" if v is None or pd.isna(v) else str(v)
-                if "<font" in txt or c in ("Service","Description","Notes"):
-                    cells.append(Paragraph(txt, bod))
-                else:
-                    cells.append(txt)
-            data.append(cells)
-
-        tbl = Table(data, colWidths=colw, repeatRows=1)
-        tbl.setStyle(TableStyle([
-            ("GRID",(0,0),(-1,-1),0.4,colors.black),
-            ("BACKGROUND",(0,0),(-1,0),colors.lightgrey),
-            ("FONTNAME",(0,0),(-1,0),"DMSerif"),
-            ("FONTNAME",(0,1),(-1,-1),"Barlow"),
-            ("FONTSIZE",(0,0),(-1,-1),7),
-            ("ALIGN",(0,0),(-1,-1),"CENTER"),
-            ("VALIGN",(0,0),(-1,-1),"MIDDLE"),
-            ("BACKGROUND",(0,len(data)-1),(-1,len(data)-1),colors.lightgrey),
-            ("FONTNAME",(0,len(data)-1),(-1,len(data)-1),"DMSerif"),
+        # only wrap cells that carry markup or overflow their column;
+        # everything else is a plain string styled by the TableStyle below
+        header = [Paragraph(c, HDR_STYLE) for c in df.columns]
+        # one object matrix for the body; wrapped cells are swapped in place
+        # and the table copies each row into its own list (normalizeData)
+        body = df.astype(str)
+        arr = body.to_numpy()
+        # resolve widths as the table will: pad with the last width, or trim
+        n = arr.shape[1]
+        cw = (colw + [colw[-1]] * n)[:n]
+        for i in range(arr.shape[1]):
+            need = body.iloc[:, i].str.contains("<font", regex=False).to_numpy()
+            if i in wrap_cols:
+                limit = cw[i] - 12
+                need |= np.fromiter(
+                    (pdfmetrics.stringWidth(t, "Barlow", 7) > limit for t in arr[:, i]),
+                    dtype=bool, count=len(arr),
+                )
+            for j in np.flatnonzero(need):
+                arr[j, i] = Paragraph(arr[j, i], BOD_STYLE)
+        data = [header, *arr.tolist()]
+
+        tbl = LongTable(data, colWidths=cw, repeatRows=1, splitByRow=1)
+        last = len(data) - 1
+        tbl.setStyle(TableStyle(SEGMENT_STYLE + [
+            *[("ALIGN",(i,1),(i,-1),"LEFT") for i in wrap_cols],
+            ("BACKGROUND",(0,last),(-1,last),colors.lightgrey),
+            ("FONTNAME",(0,last),(-1,last),"DMSerif"),
         ]))
         elems.append(tbl)
         elems.append(Spacer(1,24))
@@ -234,7 +406,7 @@ def make_pdf(segments, title, table_titles):
     row_cells=[]
     for c in cols:
         if c=="Service":
-            row_cells.append(Paragraph("Grand Total", hdr))
+            row_cells.append(Paragraph("Grand Total", HDR_STYLE))
         elif c=="Item Total":
             row_cells.append(grand_fmt)
         else:
@@ -255,91 +427,111 @@ def make_pdf(segments, title, table_titles):
     return buf
 
 
+@st.cache_data(max_entries=8, show_spinner=False)
+def build_pdf(segments, title, table_titles):
+    segments = [
+        {"name": seg["name"], "df": calculate_and_insert_totals(seg["df"])}
+        for seg in segments
+    ]
+    with make_pdf(segments, title, table_titles) as buf:
+        return buf.read()
+
+
 def main():
     st.title("🔄 Proposal → PDF")
     uploaded = st.file_uploader("Upload Excel/CSV", type=["xls","xlsx","csv"])
     if not uploaded:
         return
 
-    df = load_and_prepare_dataframe(uploaded)
-    df = transform_service_column(df)
-    df = replace_est(df)
-    segments = split_tables(df)
+    df, segments = load_segments(uploaded.getvalue(), uploaded.name)
 
-    # Inline editing
+    # Column choice stays outside the form: a dynamic data_editor's identity
+    # follows its data, so changing columns in the same submit as cell edits
+    # would silently discard those edits
+    views = []
     for seg in segments:
         df_seg = seg["df"].loc[
-            ~seg["df"]["Service"].fillna("").str.strip()
-               .str.lower().str.contains(r'est(?:\.|\s)?\s*conversions?')
+            ~seg["df"]["Service"].fillna("")
+               .str.contains(_EST_CONV, case=False, na=False)
         ].reset_index(drop=True)
-
-        st.markdown(f"**Edit table: {seg['name']}**")
         keep = st.multiselect(
-            "Columns to show/edit:",
+            f"Columns to show/edit in {seg['name']}:",
             options=df_seg.columns.tolist(),
             default=df_seg.columns.tolist(),
             key=f"cols_{seg['name']}"
         )
-        edited = st.data_editor(
-            df_seg[keep].fillna(""),
+        views.append(df_seg[keep])
+
+    # the remaining inputs are batched in one form, so editing a cell or
+    # typing a title doesn't rerun the script until "Generate PDF" is pressed
+    with st.form("pdf_params"):
+        # Inline editing
+        for seg, view in zip(segments, views):
+            st.markdown(f"**Edit table: {seg['name']}**")
+            edited = st.data_editor(
+                view.fillna(""),
+                num_rows="dynamic",
+                use_container_width=True,
+                key=f"editor_{seg['name']}"
+            )
+            seg["df"] = edited.reset_index(drop=True)
+
+        # Table-specific Titles
+        table_titles = {}
+        for seg in segments:
+            table_titles[seg["name"]] = st.text_input(
+                f'Title above "{seg["name"]}" (leave blank for none):',
+                key=f"title_{seg['name']}"
+            )
+
+        # Hyperlink specs
+        table_names = [s["name"] for s in segments]
+        all_columns = df.columns.tolist()
+        spec_df = pd.DataFrame({
+            "Table": pd.Categorical([], categories=table_names),
+            "Column": pd.Categorical([], categories=all_columns),
+            "Row": pd.Series(dtype="int"),
+            "URL": pd.Series(dtype="string"),
+        })
+
+        link_specs = st.data_editor(
+            spec_df,
+            column_config={
+                "Table": st.column_config.SelectboxColumn("Table", options=table_names),
+                "Column": st.column_config.SelectboxColumn("Column", options=all_columns),
+                "Row": st.column_config.NumberColumn("Row", min_value=0, step=1),
+                "URL": st.column_config.TextColumn("URL"),
+            },
             num_rows="dynamic",
             use_container_width=True,
-            key=f"editor_{seg['name']}"
-        )
-        seg["df"] = edited.reset_index(drop=True)
-
-    # Table-specific Titles
-    table_titles = {}
-    for seg in segments:
-        table_titles[seg["name"]] = st.text_input(
-            f'Title above "{seg["name"]}" (leave blank for none):',
-            key=f"title_{seg['name']}"
+            key="link_specs"
         )
 
-    # Hyperlink specs
-    table_names = [s["name"] for s in segments]
-    all_columns = df.columns.tolist()
-    spec_df = pd.DataFrame({
-        "Table": pd.Categorical([], categories=table_names),
-        "Column": pd.Categorical([], categories=all_columns),
-        "Row": pd.Series(dtype="int"),
-        "URL": pd.Series(dtype="string"),
-    })
-
-    link_specs = st.data_editor(
-        spec_df,
-        column_config={
-            "Table": st.column_config.SelectboxColumn("Table", options=table_names),
-            "Column": st.column_config.SelectboxColumn("Column", options=all_columns),
-            "Row": st.column_config.NumberColumn("Row", min_value=0, step=1),
-            "URL": st.column_config.TextColumn("URL"),
-        },
-        num_rows="dynamic",
-        use_container_width=True,
-        key="link_specs"
-    )
+        title = st.text_input("Proposal Title", os.path.splitext(uploaded.name)[0])
+        submitted = st.form_submit_button("Generate PDF")
 
-    # Apply hyperlinks
-    for _, spec in link_specs.dropna(subset=["Table","Column","URL"]).iterrows():
-        tbl_name, col, idx, url = (
-            spec["Table"], spec["Column"], int(spec["Row"]), spec["URL"]
-        )
-        for seg in segments:
-            if seg["name"] == tbl_name:
-                df_tbl = seg["df"].reset_index(drop=True)
-                if col in df_tbl.columns and 0 <= idx < len(df_tbl):
-                    ci = df_tbl.columns.get_loc(col)
-                    base = str(df_tbl.iat[idx,ci])
-                    df_tbl.iat[idx,ci] = (
-                        f'{base} – <font color="blue"><a href="{url}">link</a></font>'
-                    )
-                    seg["df"] = df_tbl
-
-    title = st.text_input("Proposal Title", os.path.splitext(uploaded.name)[0])
-    if st.button("Generate PDF"):
-        for seg in segments:
-            seg["df"] = calculate_and_insert_totals(seg["df"])
-        pdf = make_pdf(segments, title, table_titles)
+    if submitted:
+        # Apply hyperlinks
+        for _, spec in link_specs.dropna(subset=["Table","Column","URL"]).iterrows():
+            tbl_name, col, idx, url = (
+                spec["Table"], spec["Column"], int(spec["Row"]), spec["URL"]
+            )
+            for seg in segments:
+                if seg["name"] == tbl_name:
+                    df_tbl = seg["df"].reset_index(drop=True)
+                    if col in df_tbl.columns and 0 <= idx < len(df_tbl):
+                        ci = df_tbl.columns.get_loc(col)
+                        cur = df_tbl.iat[idx,ci]
+                        if isinstance(cur, str):
+                            base = cur
+                        else:
+                            base = "" if pd.isna(cur) else str(cur)
+                        df_tbl.iat[idx,ci] = (
+                            f'{base} – <font color="blue"><a href="{url}">link</a></font>'
+                        )
+                        seg["df"] = df_tbl
+
+        pdf = build_pdf(segments, title, table_titles)
         st.download_button(
             "📥 Download PDF",
             data=pdf,